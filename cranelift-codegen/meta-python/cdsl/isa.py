@@ -13,7 +13,7 @@ try:
     from typing import Tuple, Union, Any, Iterable, Sequence, List, Set, Dict, TYPE_CHECKING  # noqa
     if TYPE_CHECKING:
         from .instructions import MaybeBoundInst, InstructionFormat  # noqa
-        from .predicates import PredNode, PredKey  # noqa
+        from .predicates import PredNode, PredKey, PredContext  # noqa
         from .settings import SettingGroup  # noqa
         from .registers import RegBank  # noqa
         from .xform import XFormGroup  # noqa
@@ -104,15 +104,29 @@ class TargetISA(object):
 
         Ensures that all ISA predicates have an assigned bit number in
         `self.settings`.
+
+        Instruction predicates that are structurally different but generate
+        the same Rust code for the same format are merged, so each encoding
+        refers to the first such predicate.
         """
         self.instp_number = OrderedDict()  # type: OrderedDict[PredNode, int]
+        # Map instp -> first instp with the same context and Rust code.
+        canonical = dict()  # type: Dict[PredNode, PredNode]
+        by_code = dict()  # type: Dict[Tuple[PredContext, str], PredNode]
         for cpumode in self.cpumodes:
             for enc in cpumode.encodings:
                 instp = enc.instp
-                if instp and instp not in self.instp_number:
-                    # assign predicate number starting from 0.
-                    n = len(self.instp_number)
-                    self.instp_number[instp] = n
+                if instp:
+                    if instp not in canonical:
+                        key = (instp.predicate_context(),
+                               instp.rust_predicate(0))
+                        canonical[instp] = by_code.setdefault(key, instp)
+                    instp = canonical[instp]
+                    enc.instp = instp
+                    if instp not in self.instp_number:
+                        # assign predicate number starting from 0.
+                        n = len(self.instp_number)
+                        self.instp_number[instp] = n
 
                 # All referenced ISA predicates must have a number in
                 # `self.settings`. This may cause some parent predicates to be
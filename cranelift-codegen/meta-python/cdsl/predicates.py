@@ -26,7 +26,7 @@ from functools import reduce
 from .formats import instruction_context
 
 try:
-    from typing import Sequence, Tuple, Set, Any, Union, TYPE_CHECKING  # noqa
+    from typing import Sequence, Tuple, List, Any, Union, TYPE_CHECKING  # noqa
     if TYPE_CHECKING:
         from .formats import InstructionFormat, InstructionContext, FormatField  # noqa
         from .instructions import Instruction  # noqa
@@ -98,9 +98,10 @@ class Predicate(object):
         return self.context
 
     def predicate_leafs(self, leafs):
-        # type: (Set[PredLeaf]) -> None
+        # type: (List[PredLeaf]) -> None
         """
-        Collect all leaf predicates into the `leafs` set.
+        Collect all leaf predicates into the `leafs` list, in the order they
+        appear in the predicate.
         """
         for part in self.parts:
             part.predicate_leafs(leafs)
@@ -234,8 +235,8 @@ class FieldPredicate(object):
         return (self.function, str(self.field)) + a
 
     def predicate_leafs(self, leafs):
-        # type: (Set[PredLeaf]) -> None
-        leafs.add(self)
+        # type: (List[PredLeaf]) -> None
+        leafs.append(self)
 
     def rust_predicate(self, prec):
         # type: (int) -> str
@@ -376,8 +377,8 @@ class TypePredicate(object):
         return ('typecheck', self.value_arg, self.value_type.name)
 
     def predicate_leafs(self, leafs):
-        # type: (Set[PredLeaf]) -> None
-        leafs.add(self)
+        # type: (List[PredLeaf]) -> None
+        leafs.append(self)
 
     @staticmethod
     def typevar_check(inst, typevar, value_type):
@@ -434,8 +435,8 @@ class CtrlTypePredicate(object):
         return ('ctrltypecheck', self.value_type.name)
 
     def predicate_leafs(self, leafs):
-        # type: (Set[PredLeaf]) -> None
-        leafs.add(self)
+        # type: (List[PredLeaf]) -> None
+        leafs.append(self)
 
     def rust_predicate(self, prec):
         # type: (int) -> str
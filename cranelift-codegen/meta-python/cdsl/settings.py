@@ -4,7 +4,7 @@ from collections import OrderedDict
 from .predicates import Predicate
 
 try:
-    from typing import Tuple, Set, List, Dict, Any, Union, TYPE_CHECKING  # noqa
+    from typing import Tuple, List, Dict, Any, Union, TYPE_CHECKING  # noqa
     BoolOrPresetOrDict = Union['BoolSetting', 'Preset', Dict['Setting', Any]]
     if TYPE_CHECKING:
         from .predicates import PredLeaf, PredNode, PredKey  # noqa
@@ -101,8 +101,8 @@ class BoolSetting(Setting):
         return ('setting', self.group.name, self.name)
 
     def predicate_leafs(self, leafs):
-        # type: (Set[PredLeaf]) -> None
-        leafs.add(self)
+        # type: (List[PredLeaf]) -> None
+        leafs.append(self)
 
     def rust_predicate(self, prec):
         # type: (int) -> str
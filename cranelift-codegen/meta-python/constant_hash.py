@@ -31,8 +31,8 @@ def simple_hash(s):
     return h
 
 
-def compute_quadratic(items, hash_function):
-    # type: (Iterable[Any], Callable[[Any], int]) -> List[Any]
+def compute_quadratic(items, hash_function, slack=1.20):
+    # type: (Iterable[Any], Callable[[Any], int], float) -> List[Any]
     """
     Compute an open addressed, quadratically probed hash table containing
     `items`. The returned table is a list containing the elements of the
@@ -41,15 +41,22 @@ def compute_quadratic(items, hash_function):
     :param items: Iterable set of items to place in hash table.
     :param hash_function: Hash function which takes an item and returns a
             number.
+    :param slack: The table size is chosen to be larger than `slack` times
+            the number of items. The default leaves >20% unused slots, a
+            larger value gives shorter probe sequences.
 
     Simple example (see hash values above, they collide on slot 1):
         >>> compute_quadratic(['Hello', 'world'], simple_hash)
         [None, 'Hello', 'world', None]
+
+    With more slack, the items don't collide:
+        >>> compute_quadratic(['Hello', 'world'], simple_hash, slack=2.0)
+        [None, 'Hello', None, None, None, 'world', None, None]
     """
 
     items = list(items)
-    # Table size must be a power of two. Aim for >20% unused slots.
-    size = next_power_of_two(int(1.20*len(items)))
+    # Table size must be a power of two.
+    size = next_power_of_two(int(slack*len(items)))
     table = [None] * size  # type: List[Any]
 
     for i in items:
@@ -55,6 +55,7 @@ import srcgen
 from constant_hash import compute_quadratic
 from unique_table import UniqueSeqTable
 from collections import OrderedDict, defaultdict
+from array import array
 import math
 from itertools import groupby
 from cdsl.registers import RegClass, Register, Stack
@@ -63,13 +64,16 @@ from cdsl.settings import SettingGroup
 from cdsl.formats import instruction_context, InstructionFormat
 
 try:
-    from typing import Sequence, Set, Tuple, List, Dict, Iterable, DefaultDict, TYPE_CHECKING  # noqa
+    from typing import Any, Sequence, Set, Tuple, List, Dict, Iterable, DefaultDict, TYPE_CHECKING  # noqa
     if TYPE_CHECKING:
         from cdsl.isa import TargetISA, OperandConstraint, Encoding, CPUMode, EncRecipe, RecipePred  # noqa
         from cdsl.predicates import PredNode, PredLeaf  # noqa
         from cdsl.types import ValueType  # noqa
         from cdsl.instructions import Instruction  # noqa
         from cdsl.xform import XFormGroup  # noqa
+        # A doc comment that hasn't been formatted yet: A format string
+        # followed by the objects to format with `doc_str()`.
+        Doc = Tuple[Any, ...]
 except ImportError:
     pass
 
@@ -96,18 +100,18 @@ def emit_instp(instp, fmt, has_func=False):
     # Which fields do we need in the InstructionData pattern match?
     has_type_check = False
     # Collect the leaf predicates.
-    leafs = set()  # type: Set[PredLeaf]
+    leafs = list()  # type: List[PredLeaf]
     instp.predicate_leafs(leafs)
     # All the leafs are FieldPredicate or TypePredicate instances. Here we just
-    # care about the field names.
-    fnames = set()  # type: Set[str]
+    # care about the unique field names, in the order they first appear.
+    fnames = OrderedDict()  # type: OrderedDict[str, None]
     for p in leafs:
         if isinstance(p, FieldPredicate):
-            fnames.add(p.field.rust_destructuring_name())
+            fnames[p.field.rust_destructuring_name()] = None
         else:
             assert isinstance(p, TypePredicate)
             has_type_check = True
-    fields = ', '.join(sorted(fnames))
+    fields = ', '.join(fnames)
 
     with fmt.indented(
             'if let crate::ir::InstructionData::{} {{ {}, .. }} = *inst {{'
@@ -128,6 +132,11 @@ def emit_inst_predicates(instps, fmt):
     """
     Emit private functions for matching instruction predicates as well as a
     static `INST_PREDICATES` array indexed by predicate number.
+
+    The `Encodings` iterator dispatches through this array, so testing a
+    predicate is a single indirect call no matter how many predicates the ISA
+    has. Each function only destructures the one instruction format it
+    applies to.
     """
     for instp, number in instps.items():
         name = 'inst_predicate_{}'.format(number)
@@ -196,6 +205,36 @@ def emit_recipe_predicates(isa, fmt):
                 fmt.format('Some({}),', pname[p])
 
 
+# Cache of doc comment strings for encodings and predicates. The same objects
+# appear in many encoding lists, so they are only formatted once per ISA.
+_doc_strs = dict()  # type: Dict[Any, str]
+
+
+def doc_str(obj):
+    # type: (Any) -> str
+    """
+    Get the string representation of `obj` for use in a doc comment.
+    """
+    s = _doc_strs.get(obj)
+    if s is None:
+        s = str(obj)
+        _doc_strs[obj] = s
+    return s
+
+
+def format_doc(doc):
+    # type: (Doc) -> str
+    """
+    Format a doc comment that was recorded as a format string followed by its
+    arguments.
+
+        >>> format_doc(('skip {} unless {}', 2, 'pred'))
+        'skip 2 unless pred'
+    """
+    template = doc[0]  # type: str
+    return template.format(*[doc_str(arg) for arg in doc[1:]])
+
+
 # The u16 values in an encoding list entry are interpreted as follows:
 #
 # NR = len(all_recipes)
@@ -227,17 +266,21 @@ class Encoder:
 
     :param NR: Number of recipes.
     :param NI: Number of instruction predicates.
+
+    The `words` array is preallocated to hold `size` u16 words.
     """
 
-    def __init__(self, isa):
-        # type: (TargetISA) -> None
+    def __init__(self, isa, size):
+        # type: (TargetISA, int) -> None
         self.isa = isa
         self.NR = len(isa.all_recipes)
         self.NI = len(isa.instp_number)
         # u16 encoding list words.
-        self.words = list()  # type: List[int]
+        self.words = array('H', [0]) * size  # type: array
+        # Number of entries in `words` written so far.
+        self.pos = 0
         # Documentation comments: Index into `words` + comment.
-        self.docs = list()  # type: List[Tuple[int, str]]
+        self.docs = list()  # type: List[Tuple[int, Doc]]
 
     # Encoding lists are represented as u16 arrays.
     CODE_BITS = 16
@@ -260,15 +303,17 @@ class Encoder:
     def recipe(self, enc, final):
         # type: (Encoding, bool) -> None
         """Add a recipe+bits entry to the list."""
-        offset = len(self.words)
+        offset = self.pos
         code = 2 * enc.recipe.number
-        doc = '--> {}'.format(enc)
+        doc = ('--> {}', enc)  # type: Doc
         if final:
             code += 1
-            doc += ' and stop'
+            doc = ('--> {} and stop', enc)
 
         assert(code < self.PRED_START)
-        self.words.extend((code, enc.encbits))
+        self.words[offset] = code
+        self.words[offset + 1] = enc.encbits
+        self.pos = offset + 2
         self.docs.append((offset, doc))
 
     def _pred(self, pred, skip, n):
@@ -280,13 +325,13 @@ class Encoder:
         assert code < (1 << self.CODE_BITS)
 
         if skip == 0:
-            doc = 'stop'
+            doc = ('stop unless {}', pred)  # type: Doc
         else:
-            doc = 'skip ' + str(skip)
-        doc = '{} unless {}'.format(doc, pred)
+            doc = ('skip {} unless {}', skip, pred)
 
-        self.docs.append((len(self.words), doc))
-        self.words.append(code)
+        self.docs.append((self.pos, doc))
+        self.words[self.pos] = code
+        self.pos += 1
 
     def instp(self, pred, skip):
         # type: (PredNode, int) -> None
@@ -455,9 +500,17 @@ class EncList(object):
         Generate an optimized encoder tree for this list. The tree represents
         all of the encodings with parent nodes for the predicates that need
         checking.
+
+        Encodings that repeat an earlier encoding with the same predicates are
+        left out since they can't produce anything new.
         """
         forest = list()  # type: List[EncNode]
+        seen = set()  # type: Set[Tuple[EncRecipe, int, PredNode, PredNode]]
         for enc in self.encodings:
+            key = (enc.recipe, enc.encbits, enc.instp, enc.isap)
+            if key in seen:
+                continue
+            seen.add(key)
             n = EncLeaf(enc)  # type: EncNode
             if enc.instp:
                 n = EncPred(enc.instp, [n])
@@ -468,29 +521,32 @@ class EncList(object):
         return EncPred(None, forest).optimize()
 
     def encode(self, seq_table, doc_table, isa):
-        # type: (UniqueSeqTable, DefaultDict[int, List[str]], TargetISA) -> None  # noqa
+        # type: (UniqueSeqTable, DefaultDict[int, List[Doc]], TargetISA) -> None  # noqa
         """
         Encode this list as a sequence of u16 numbers.
 
         Adds the sequence to `seq_table` and records the returned offset as
         `self.offset`.
 
-        Adds comment lines to `doc_table` keyed by seq_table offsets.
+        Adds comment lines to `doc_table` keyed by seq_table offsets. The
+        comments are only formatted when they are emitted.
         """
         # Use an encoder object to hold the parameters.
-        encoder = Encoder(isa)
         tree = self.encoder_tree()
+        encoder = Encoder(isa, tree.size())
         tree.encode(encoder, True)
+        assert encoder.pos == len(encoder.words)
 
         self.offset = seq_table.add(encoder.words)
 
         # Add doc comments.
+        name = self.name()
         doc_table[self.offset].append(
-                '{:06x}: {}'.format(self.offset, self.name()))
+                ('{}: {}', '{:06x}'.format(self.offset), name))
         for pos, doc in encoder.docs:
             doc_table[self.offset + pos].append(doc)
         doc_table[self.offset + len(encoder.words)].insert(
-                0, 'end of: {}'.format(self.name()))
+                0, ('end of: {}', name))
 
 
 class Level2Table(object):
@@ -514,7 +570,7 @@ class Level2Table(object):
     def __getitem__(self, inst):
         # type: (Instruction) -> EncList
         ls = self.lists.get(inst)
-        if not ls:
+        if ls is None:
             ls = EncList(inst, self.ty)
             self.lists[inst] = ls
         return ls
@@ -539,11 +595,16 @@ class Level2Table(object):
         Compute the hash table mapping opcode -> enclist.
 
         Append the hash table to `level2_hashtables` and record the offset.
+
+        The table is kept at most half full. It is probed once for every
+        instruction passed to `TargetIsa::encode()`, so short probe
+        sequences are worth the extra space.
         """
         def hash_func(enclist):
             # type: (EncList) -> int
             return enclist.inst.number
-        hash_table = compute_quadratic(self.lists.values(), hash_func)
+        hash_table = compute_quadratic(
+                self.lists.values(), hash_func, slack=2.0)
 
         self.hash_table_offset = len(level2_hashtables)
         self.hash_table_len = len(hash_table)
@@ -576,7 +637,7 @@ class Level1Table(object):
     def __getitem__(self, ty):
         # type: (ValueType) -> Level2Table
         tbl = self.tables.get(ty)
-        if not tbl:
+        if tbl is None:
             legalize = self.cpumode.get_legalize_action(ty)
             # Allocate a legalization code in a predictable order.
             self.cpumode.isa.legalize_code(legalize)
@@ -595,10 +656,18 @@ def make_tables(cpumode):
     Generate tables for `cpumode` as described above.
     """
     table = Level1Table(cpumode)
+    # Look up the tables directly and only fall back to `__getitem__` to
+    # create missing entries. This is the hot loop for large ISAs.
+    tables = table.tables
     for enc in cpumode.encodings:
         ty = enc.ctrl_typevar()
-        inst = enc.inst
-        table[ty][inst].encodings.append(enc)
+        level2 = tables.get(ty)
+        if level2 is None:
+            level2 = table[ty]
+        enclist = level2.lists.get(enc.inst)
+        if enclist is None:
+            enclist = level2[enc.inst]
+        enclist.encodings.append(enc)
 
     # Ensure there are level 1 table entries for all types with a custom
     # legalize action.
@@ -609,31 +678,63 @@ def make_tables(cpumode):
 
 
 def encode_enclists(level1, seq_table, doc_table, isa):
-    # type: (Level1Table, UniqueSeqTable, DefaultDict[int, List[str]], TargetISA) -> None  # noqa
+    # type: (Level1Table, UniqueSeqTable, DefaultDict[int, List[Doc]], TargetISA) -> None  # noqa
     """
     Compute encodings and doc comments for encoding lists in `level1`.
+
+    The longest lists are encoded first so the shorter lists can reuse their
+    tails.
     """
-    for level2 in level1.l2tables():
-        for enclist in level2.enclists():
-            enclist.encode(seq_table, doc_table, isa)
+    enclists = [enclist
+                for level2 in level1.l2tables()
+                for enclist in level2.enclists()]
+    enclists.sort(key=lambda enclist: -len(enclist.encodings))
+    for enclist in enclists:
+        enclist.encode(seq_table, doc_table, isa)
 
 
 def emit_enclists(seq_table, doc_table, fmt):
-    # type: (UniqueSeqTable, DefaultDict[int, List[str]], srcgen.Formatter) -> None  # noqa
+    # type: (UniqueSeqTable, DefaultDict[int, List[Doc]], srcgen.Formatter) -> None  # noqa
     with fmt.indented(
             'pub static ENCLISTS: [u16; {}] = ['.format(len(seq_table.table)),
             '];'):
-        line = ''
-        for idx, entry in enumerate(seq_table.table):
-            if idx in doc_table:
-                if line:
-                    fmt.line(line)
-                    line = ''
-                for doc in doc_table[idx]:
-                    fmt.comment(doc)
-            line += '{:#06x}, '.format(entry)
-        if line:
-            fmt.line(line)
+        # Table offsets are dense, so move the doc comments into a list
+        # indexed by offset. That is cheaper to probe than `doc_table`.
+        docs = [None] * len(seq_table.table)  # type: List[List[Doc]]
+        for idx, comments in doc_table.items():
+            if idx < len(docs):
+                docs[idx] = comments
+
+        # The entries between doc comments go on a single line which is
+        # formatted in one go.
+        start = 0
+        for idx, comments in enumerate(docs):
+            if comments is None:
+                continue
+            if idx > start:
+                fmt.line(format_entries(seq_table.table[start:idx]))
+                start = idx
+            # Lists sharing entries often describe them the same way. Skip
+            # comments that repeat the one before them.
+            prev = None  # type: str
+            for doc in comments:
+                comment = format_doc(doc)
+                if comment != prev:
+                    fmt.comment(comment)
+                    prev = comment
+        if start < len(seq_table.table):
+            fmt.line(format_entries(seq_table.table[start:]))
+
+
+def format_entries(entries):
+    # type: (Sequence[int]) -> str
+    """
+    Format a sequence of u16 table entries as Rust array elements.
+
+        >>> format_entries([0, 0x29, 0x1004])
+        '0x0000, 0x0029, 0x1004, '
+    """
+    return ('0x%04x, ' * len(entries)) % tuple(entries)
 
 
 def encode_level2_hashtables(level1, level2_hashtables, level2_doc):
@@ -858,13 +959,16 @@ def gen_isa(isa, fmt):
     level1_tables = dict()
 
     # Tables for enclists with comments.
-    seq_table = UniqueSeqTable()
-    doc_table = defaultdict(list)  # type: DefaultDict[int, List[str]]
+    seq_table = UniqueSeqTable('H')
+    doc_table = defaultdict(list)  # type: DefaultDict[int, List[Doc]]
 
     # Single table containing all the level2 hash tables.
     level2_hashtables = list()  # type: List[EncList]
     level2_doc = defaultdict(list)  # type: DefaultDict[int, List[str]]
 
+    # CPU modes are processed one at a time and in order. The encoding lists
+    # of all modes share `seq_table`, so the layout of the generated tables
+    # depends on the order the lists are added in.
     for cpumode in isa.cpumodes:
         level2_doc[len(level2_hashtables)].append(cpumode.name)
         level1 = make_tables(cpumode)
@@ -899,4 +1003,5 @@ def generate(isas, out_dir):
     for isa in isas:
         fmt = srcgen.Formatter()
         gen_isa(isa, fmt)
+        _doc_strs.clear()
         fmt.update_file('encoding-{}.rs'.format(isa.name), out_dir)
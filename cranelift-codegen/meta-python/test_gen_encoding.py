@@ -0,0 +1,8 @@
+from __future__ import absolute_import
+import doctest
+import gen_encoding
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(gen_encoding))
+    return tests
@@ -0,0 +1,8 @@
+from __future__ import absolute_import
+import doctest
+import unique_table
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(unique_table))
+    return tests
@@ -6,6 +6,7 @@ item is mapped to its offset in the final array.
 
 This is a compression technique for compile-time generated tables.
 """
+from array import array
 
 try:
     from typing import Any, List, Dict, Tuple, Sequence  # noqa
@@ -44,13 +45,56 @@ class UniqueSeqTable:
     """
     Collect sequences into the `table` list, removing duplicates.
 
-    Sequences don't have to be of the same length.
+    Sequences don't have to be of the same length. A sequence that already
+    appears anywhere in the table is reused, even if it straddles the boundary
+    between two previously added sequences:
+
+        >>> t = UniqueSeqTable()
+        >>> t.add([1, 2, 3])
+        0
+        >>> t.add([4, 5])
+        3
+        >>> t.add([3, 4])
+        2
+        >>> t.add([2])
+        1
+        >>> t.table
+        [1, 2, 3, 4, 5]
+
+    A new sequence that begins with the items at the end of the table overlaps
+    them, and only the remaining items are appended:
+
+        >>> t.add([4, 5, 6])
+        3
+        >>> t.table
+        [1, 2, 3, 4, 5, 6]
+
+    Tables of integers can be stored packed in an `array` with the given
+    `typecode` instead of a list:
+
+        >>> t = UniqueSeqTable('H')
+        >>> t.add([0x1000, 1])
+        0
+        >>> t.table
+        array('H', [4096, 1])
     """
-    def __init__(self):
-        # type: () -> None
-        self.table = list()  # type: List[Any]
-        # Map seq -> index.
+
+    # Length of the windows used to index positions in `table`. Sequences
+    # shorter than this are looked up by their full length.
+    WINDOW = 3
+
+    def __init__(self, typecode=None):
+        # type: (str) -> None
+        self.typecode = typecode
+        if typecode is None:
+            self.table = list()  # type: Any
+        else:
+            self.table = array(typecode)
+        # Map seq -> index for sequences that have been looked up before.
         self.index = dict()  # type: Dict[Tuple[Any, ...], int]
+        # Map windows of up to `WINDOW` items to the ascending list of offsets
+        # in `table` where they occur.
+        self.windows = dict()  # type: Dict[Tuple[Any, ...], List[int]]
 
     def add(self, seq):
         # type: (Sequence[Any]) -> int
@@ -63,18 +107,51 @@ class UniqueSeqTable:
         if len(seq) == 0:
             return 0
         tseq = tuple(seq)
-        if tseq in self.index:
-            return self.index[tseq]
-
-        idx = len(self.table)
-        self.table.extend(tseq)
-
-        # Add seq and all sub-sequences to `index`.
-        index = self.index  # type: Dict[Tuple[Any, ...], int]
-        assert index is not None
-        for length in range(1, len(tseq) + 1):
-            for offset in range(len(tseq) - length + 1):
-                key = tseq[offset:offset+length]
-                index[key] = idx + offset
-
+        idx = self.index.get(tseq)
+        if idx is not None:
+            return idx
+
+        # Probe the window index with the first items of `seq` and verify the
+        # candidates with a single slice comparison.
+        table = self.table
+        if self.typecode is None:
+            items = list(tseq)  # type: Any
+        else:
+            items = array(self.typecode, tseq)
+        length = len(items)
+        for offset in self.windows.get(tseq[:self.WINDOW], ()):
+            if table[offset:offset+length] == items:
+                self.index[tseq] = offset
+                return offset
+
+        # Find the longest prefix of `seq` that matches the end of the table.
+        end = len(table)
+        for overlap in range(min(length - 1, end), 0, -1):
+            if table[end-overlap:] == items[:overlap]:
+                break
+        else:
+            overlap = 0
+
+        table.extend(items[overlap:])
+        self._add_windows(end)
+        idx = end - overlap
+        self.index[tseq] = idx
         return idx
+
+    def _add_windows(self, start):
+        # type: (int) -> None
+        """
+        Index all the windows in `table` that end after `start`.
+        """
+        table = self.table
+        windows = self.windows
+        end = len(table)
+        for pos in range(max(0, start - self.WINDOW + 1), end):
+            for wend in range(max(pos, start) + 1,
+                              min(pos + self.WINDOW, end) + 1):
+                key = tuple(table[pos:wend])
+                offsets = windows.get(key)
+                if offsets is None:
+                    windows[key] = [pos]
+                else:
+                    offsets.append(pos)
@@ -1,20 +1,36 @@
+use std::collections::HashMap;
+use std::hash::Hash;
 use std::slice;
 
+/// Length of the windows used to index positions in a `UniqueTable`. Sequences shorter than this
+/// are looked up by their full length.
+const WINDOW: usize = 3;
+
 /// A table of sequences which tries to avoid common subsequences.
-pub struct UniqueTable<T: PartialEq + Clone> {
+///
+/// All windows of up to `WINDOW` items in the table are indexed, so looking for an existing copy
+/// of a sequence only needs to compare the places that start with the same items. c.f.
+/// `UniqueSeqTable` in `meta-python/unique_table.py`.
+pub struct UniqueTable<T: Hash + Eq + Clone> {
     table: Vec<T>,
+    /// Map of windows of up to `WINDOW` items to the ascending offsets where they occur.
+    windows: HashMap<Vec<T>, Vec<usize>>,
 }
 
-impl<T: PartialEq + Clone> UniqueTable<T> {
+impl<T: Hash + Eq + Clone> UniqueTable<T> {
     pub fn new() -> Self {
-        Self { table: Vec::new() }
+        Self {
+            table: Vec::new(),
+            windows: HashMap::new(),
+        }
     }
     pub fn add(&mut self, values: &Vec<T>) -> usize {
-        if let Some(offset) = find_subsequence(values, &self.table) {
+        if let Some(offset) = self.find(values) {
             offset
         } else {
             let offset = self.table.len();
             self.table.extend((*values).clone());
+            self.add_windows(offset);
             offset
         }
     }
@@ -24,45 +40,50 @@ impl<T: PartialEq + Clone> UniqueTable<T> {
     pub fn iter(&self) -> slice::Iter<T> {
         self.table.iter()
     }
-}
 
-/// Try to find the subsequence `sub` in the `whole` sequence. Returns None if
-/// it's not been found, or Some(index) if it has been. Naive implementation
-/// until proven we need something better.
-fn find_subsequence<T: PartialEq>(sub: &Vec<T>, whole: &Vec<T>) -> Option<usize> {
-    assert!(sub.len() > 0);
-    // We want i + sub.len() <= whole.len(), i.e. i < whole.len() + 1 - sub.len().
-    if whole.len() < sub.len() {
-        return None;
+    /// Try to find `values` in the table. Returns None if it's not been found, or Some(index) of
+    /// the first occurrence if it has been.
+    fn find(&self, values: &[T]) -> Option<usize> {
+        assert!(values.len() > 0);
+        let prefix = &values[..values.len().min(WINDOW)];
+        let table = &self.table;
+        self.windows
+            .get(prefix)?
+            .iter()
+            .cloned()
+            .find(|&offset| table[offset..].starts_with(values))
     }
-    let max = whole.len() + 1 - sub.len();
-    for i in 0..max {
-        let mut found: Option<usize> = Some(i);
-        for j in 0..sub.len() {
-            if sub[j] != whole[i + j] {
-                found = None;
-                break;
+
+    /// Index all the windows in the table that end after `start`.
+    fn add_windows(&mut self, start: usize) {
+        let end = self.table.len();
+        for pos in start.saturating_sub(WINDOW - 1)..end {
+            for wend in (pos.max(start) + 1)..=(pos + WINDOW).min(end) {
+                self.windows
+                    .entry(self.table[pos..wend].to_vec())
+                    .or_insert_with(Vec::new)
+                    .push(pos);
             }
         }
-        if found.is_some() {
-            return found;
-        }
     }
-    return None;
 }
 
 #[test]
-fn test_find_subsequence() {
-    assert_eq!(find_subsequence(&vec![1], &vec![4]), None);
-    assert_eq!(find_subsequence(&vec![1], &vec![1]), Some(0));
-    assert_eq!(find_subsequence(&vec![1, 2], &vec![1]), None);
-    assert_eq!(find_subsequence(&vec![1, 2], &vec![1, 2]), Some(0));
-    assert_eq!(find_subsequence(&vec![1, 2], &vec![1, 3]), None);
-    assert_eq!(find_subsequence(&vec![1, 2], &vec![0, 1, 2]), Some(1));
-    assert_eq!(find_subsequence(&vec![1, 2], &vec![0, 1, 3, 1]), None);
-    assert_eq!(find_subsequence(&vec![1, 2], &vec![0, 1, 3, 1, 2]), Some(3));
+fn test_unique_table() {
+    let mut table = UniqueTable::new();
+    assert_eq!(table.add(&vec![1, 2, 3]), 0);
+    assert_eq!(table.add(&vec![1, 2, 3]), 0);
+    assert_eq!(table.add(&vec![2, 3]), 1);
+    assert_eq!(table.add(&vec![4, 5]), 3);
+    // Sequences straddling two previous additions are found too.
+    assert_eq!(table.add(&vec![3, 4]), 2);
+    assert_eq!(table.add(&vec![1, 2, 3, 4, 5]), 0);
+    assert_eq!(table.add(&vec![1, 3]), 5);
+    assert_eq!(table.add(&vec![1, 1, 3]), 7);
+    assert_eq!(table.add(&vec![1, 3, 1]), 5);
     assert_eq!(
-        find_subsequence(&vec![1, 1, 3], &vec![1, 1, 1, 3, 3]),
-        Some(1)
+        table.iter().cloned().collect::<Vec<_>>(),
+        vec![1, 2, 3, 4, 5, 1, 3, 1, 1, 3]
     );
+    assert_eq!(table.len(), 10);
 }
@@ -20,6 +20,9 @@ pub type RecipePredicate = Option<fn(PredicateView, &InstructionData) -> bool>;
 ///
 /// This is a predicate function that needs to be tested in addition to the recipe predicate. It
 /// can't depend on ISA settings.
+///
+/// Each ISA has a generated `INST_PREDICATES` table of these functions, indexed by instruction
+/// predicate number, so testing a predicate in an encoding list is a single indirect call.
 pub type InstPredicate = fn(&Function, &InstructionData) -> bool;
 
 /// Legalization action to perform when no encoding can be found for an instruction.